@@ -11,13 +11,77 @@
 
 import os
 import sys
+import re
 import shutil
+import functools
 from datetime import datetime
-import toml
+import tomllib
+import tomli_w
 import subprocess
 
+# [project] 表的内容（到下一个表头为止）以及其中的 version 行
+PROJECT_TABLE = re.compile(r"^\[project\][ \t]*$(.*?)(?=^\[|\Z)", re.M | re.S)
+VERSION_LINE = re.compile(r'^(version\s*=\s*)"([^"]*)"', re.M)
 
-def find_folder_or_file(start_path, target_name, max_depth=3):
+# 查找文件时的默认目录深度
+SEARCH_DEPTH = 3
+
+
+def _scandir_walk(start_path, max_depth=SEARCH_DEPTH, depth=0):
+    """
+    基于os.scandir遍历目录，逐个返回目录项
+
+    先返回当前目录下的全部条目，再进入子目录，保证浅层结果优先
+
+    Args:
+        start_path: 开始遍历的目录
+        max_depth: 最大搜索深度
+        depth: 当前深度（递归时使用）
+
+    Yields:
+        (深度, os.DirEntry) 元组
+    """
+    subdirs = []
+    try:
+        it = os.scandir(start_path)
+    except OSError:
+        # 与os.walk一致，无法读取的目录（如没有权限）直接跳过
+        return
+    with it:
+        for entry in it:
+            yield depth, entry
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+
+    # 控制搜索深度
+    if depth + 1 < max_depth:
+        for path in subdirs:
+            yield from _scandir_walk(path, max_depth, depth + 1)
+
+
+@functools.lru_cache(maxsize=1)
+def _index_tree(start_path, max_depth):
+    """
+    遍历一次目录并按名称建立索引，供多次查找复用
+
+    lru_cache按参数的写法区分缓存，调用处统一按位置传入两个参数，
+    否则同一目录会被重复遍历；
+    目录内容发生变化（删除dist、构建新包）后需调用 _index_tree.cache_clear()
+
+    Args:
+        start_path: 开始遍历的目录
+        max_depth: 最大搜索深度
+
+    Returns:
+        {名称: [os.DirEntry, ...]} 字典，同名条目按浅层优先排列
+    """
+    index = {}
+    for _, entry in _scandir_walk(start_path, max_depth):
+        index.setdefault(entry.name, []).append(entry)
+    return index
+
+
+def find_folder_or_file(start_path, target_name, max_depth=SEARCH_DEPTH):
     """
     在指定目录中查找文件夹或文件
 
@@ -29,43 +93,72 @@ def find_folder_or_file(start_path, target_name, max_depth=3):
     Returns:
         找到的路径或None
     """
-    for root, dirs, files in os.walk(start_path):
-        # 计算当前深度
-        depth = root[len(start_path) :].count(os.sep)
+    # 目标通常就在起始目录下，先直接检查，避免遍历整个目录树
+    direct_path = os.path.join(start_path, target_name)
+    if os.path.lexists(direct_path):
+        return direct_path
 
-        # 查找目标
-        if target_name in dirs:
-            return os.path.join(root, target_name)
-        if target_name in files:
-            return os.path.join(root, target_name)
+    entries = _index_tree(start_path, max_depth).get(target_name)
+    return entries[0].path if entries else None
 
-        # 控制搜索深度
-        if depth >= max_depth - 1:
-            dirs.clear()
 
-    return None
+def replace_project_version(content, new_version):
+    """
+    直接替换文本中[project]表的version值，保留原有格式和注释
 
+    Args:
+        content: pyproject.toml的文本内容
+        new_version: 新版本号
+
+    Returns:
+        (新文本, 旧版本号)，未找到version行时返回 (None, None)
+    """
+    table = PROJECT_TABLE.search(content)
+    if not table:
+        return None, None
+    match = VERSION_LINE.search(content, table.start(1), table.end(1))
+    if not match:
+        return None, None
+
+    new_content = (
+        content[: match.start()]
+        + f'{match.group(1)}"{new_version}"'
+        + content[match.end() :]
+    )
+    return new_content, match.group(2)
+
+
+def update_version(start_path):
+    """
+    更新pyproject.toml中的版本号为时间戳格式
 
-def update_version():
-    """更新pyproject.toml中的版本号为时间戳格式"""
+    Args:
+        start_path: 项目根目录
+    """
     # 查找pyproject.toml文件
-    pyproject_path = find_folder_or_file(os.getcwd(), "pyproject.toml")
+    pyproject_path = find_folder_or_file(start_path, "pyproject.toml")
     if not pyproject_path:
         print("错误: 未找到pyproject.toml文件")
         return False
 
     try:
-        # 读取并更新版本号
-        with open(pyproject_path, "r", encoding="utf-8") as f:
-            data = toml.load(f)
-
-        old_version = data["project"]["version"]
         new_version = datetime.now().strftime("%Y.%m.%d.%H%M%S")
 
-        data["project"]["version"] = new_version
+        with open(pyproject_path, "r", encoding="utf-8") as f:
+            content = f.read()
 
-        with open(pyproject_path, "w", encoding="utf-8") as f:
-            toml.dump(data, f)
+        # 优先直接替换version行，无需完整解析和重新生成toml
+        new_content, old_version = replace_project_version(content, new_version)
+        if new_content is not None:
+            with open(pyproject_path, "w", encoding="utf-8") as f:
+                f.write(new_content)
+        else:
+            data = tomllib.loads(content)
+            old_version = data["project"]["version"]
+            data["project"]["version"] = new_version
+
+            with open(pyproject_path, "wb") as f:
+                tomli_w.dump(data, f)
 
         print(f"版本号已更新: {old_version} -> {new_version}")
         return True
@@ -88,27 +181,40 @@ def run_command(cmd, cwd=None):
     """
     try:
         print(f"执行命令: {' '.join(cmd)}")
-        result = subprocess.run(
-            cmd, cwd=cwd, capture_output=True, text=True, check=True
-        )
-
-        if result.stdout:
-            print(f"输出: {result.stdout}")
+        # 标准输出直接交给终端，只收集错误输出用于失败时提示
+        subprocess.run(cmd, cwd=cwd, stderr=subprocess.PIPE, check=True)
         return True
 
     except subprocess.CalledProcessError as e:
         print(f"命令执行失败: {e}")
         if e.stderr:
-            print(f"错误: {e.stderr}")
+            print(f"错误: {e.stderr.decode('utf-8', errors='replace')}")
         return False
     except FileNotFoundError:
         print("错误: 找不到命令，请确保工具已安装")
         return False
 
 
-def clean_dist_folder():
-    """清理dist文件夹"""
-    dist_path = find_folder_or_file(os.getcwd(), "dist")
+def clean_dist_folder(start_path, max_depth=SEARCH_DEPTH):
+    """
+    清理dist文件夹
+
+    Args:
+        start_path: 项目根目录
+        max_depth: 最大搜索深度
+    """
+    # uv build 默认输出到 ./dist，先直接检查，找不到时再遍历目录
+    dist_path = os.path.join(start_path, "dist")
+    if not os.path.isdir(dist_path):
+        dist_path = next(
+            (
+                entry.path
+                for entry in _index_tree(start_path, max_depth).get("dist", [])
+                if entry.is_dir()
+            ),
+            None,
+        )
+
     if dist_path:
         try:
             shutil.rmtree(dist_path)
@@ -116,53 +222,79 @@ def clean_dist_folder():
         except Exception as e:
             print(f"删除dist文件夹失败: {e}")
             return False
+        finally:
+            _index_tree.cache_clear()
     return True
 
 
-def find_and_install_wheel():
-    """查找并安装最新的whl文件"""
-    # 查找所有whl文件
-    wheel_files = []
-    for root, dirs, files in os.walk(os.getcwd()):
-        for file in files:
-            if file.endswith(".whl"):
-                full_path = os.path.join(root, file)
-                wheel_files.append((full_path, os.path.getmtime(full_path)))
+def find_latest_wheel(start_path, max_depth=SEARCH_DEPTH):
+    """
+    查找最新的whl文件
 
-    if not wheel_files:
+    Args:
+        start_path: 开始搜索的目录
+        max_depth: 最大搜索深度
+
+    Returns:
+        最新whl文件的路径或None
+    """
+    latest_wheel, latest_mtime = None, -1.0
+    for name, entries in _index_tree(start_path, max_depth).items():
+        if not name.endswith(".whl"):
+            continue
+        for entry in entries:
+            if entry.is_file():
+                mtime = entry.stat().st_mtime
+                if mtime > latest_mtime:
+                    latest_wheel, latest_mtime = entry.path, mtime
+    return latest_wheel
+
+
+def find_and_install_wheel(start_path):
+    """
+    查找并安装最新的whl文件
+
+    Args:
+        start_path: 项目根目录
+    """
+    latest_wheel = find_latest_wheel(start_path)
+    if not latest_wheel:
         print("未找到whl文件")
         return False
 
-    # 找到最新的whl文件
-    latest_wheel = max(wheel_files, key=lambda x: x[1])[0]
     print(f"找到最新whl文件: {latest_wheel}")
 
     # 安装whl文件
-    return run_command(["uv", "tool", "install", latest_wheel])
+    return run_command(["uv", "tool", "install", latest_wheel], cwd=start_path)
 
 
 def main():
     """主流程"""
     print("=== 版本更新工具 ===\n")
 
+    # 所有步骤都以同一个目录为准
+    cwd = os.getcwd()
+
     # 1. 清理dist文件夹
     print("1. 清理dist文件夹")
-    if not clean_dist_folder():
+    if not clean_dist_folder(cwd):
         sys.exit(1)
 
     # 2. 更新版本号
     print("\n2. 更新版本号")
-    if not update_version():
+    if not update_version(cwd):
         sys.exit(1)
 
     # 3. 构建项目
     print("\n3. 构建项目")
-    if not run_command(["uv", "build"]):
+    if not run_command(["uv", "build"], cwd=cwd):
         sys.exit(1)
+    # 构建生成了新文件，清空目录索引缓存
+    _index_tree.cache_clear()
 
     # 4. 安装whl文件
     print("\n4. 安装whl文件")
-    if not find_and_install_wheel():
+    if not find_and_install_wheel(cwd):
         sys.exit(1)
 
     print("\n=== 所有步骤完成 ===")
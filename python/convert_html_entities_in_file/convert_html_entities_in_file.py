@@ -1,5 +1,18 @@
+import os
 import sys
 import html
+import tempfile
+
+
+def _get_umask():
+    """读取当前的umask，os.umask只能在设置的同时返回旧值"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# 新建文件的默认权限，与open()直接创建的文件一致
+FILE_MODE = 0o666 & ~_get_umask()
 
 
 def convert_html_entities(input_file, output_file):
@@ -13,16 +26,23 @@ def convert_html_entities(input_file, output_file):
         output_file (str): 输出文件路径
     """
     try:
-        # 读取输入文件内容
-        with open(input_file, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        # 转换HTML实体
-        converted_content = html.unescape(content)
-
-        # 写入输出文件
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(converted_content)
+        # 逐行读取并转换HTML实体，避免一次性读入整个文件
+        # HTML实体不会跨行，按行处理是安全的
+        # 先写入同目录的临时文件，完成后再替换，中断时不会留下不完整的输出文件；
+        # 临时文件名由mkstemp生成，不会覆盖或删除用户已有的文件
+        with open(input_file, "r", encoding="utf-8") as fi:
+            output_dir = os.path.dirname(os.path.abspath(output_file))
+            fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=".tmp_")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8", buffering=1 << 20) as fo:
+                    for line in fi:
+                        fo.write(html.unescape(line))
+                # mkstemp创建的文件只有自己可读写，改回普通新文件的权限
+                os.chmod(tmp_path, FILE_MODE)
+                os.replace(tmp_path, output_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
 
         print(f"转换完成！输出文件: {output_file}")
 
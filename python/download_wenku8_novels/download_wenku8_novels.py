@@ -1,8 +1,55 @@
+import os
 import sys
+import time
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
 import requests
 import html
 import re
 
+# Windows文件名中不合法的字符（预编译，避免每次调用重复查找）
+INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1F]')
+
+# 小说中最常见的实体，用str.replace直接替换；&amp; 不在其中，最后单独处理，
+# 这样 "&amp;lt;" 不会被解码两次
+SIMPLE_ENTITIES = (
+    ("&lt;", "<"),
+    ("&gt;", ">"),
+    ("&quot;", '"'),
+    ("&#39;", "'"),
+    ("&nbsp;", "\xa0"),
+)
+
+# 已处理小说的本地缓存目录（wenku8的小说ID不会变化，可直接按ID缓存）
+CACHE_DIR = Path.home() / ".cache" / "wenku8"
+
+# 复用同一个会话，多次下载时共享连接池，省去重复的TCP/TLS握手
+SESSION = requests.Session()
+
+# 流式下载的分块大小，以及块尾保留的字符数（防止HTML实体被切断在两块之间）
+CHUNK_SIZE = 1 << 16
+ENTITY_TAIL = 40
+
+# 批量下载时的最大并发数，以及每个请求前的随机等待秒数（避免请求过于密集）
+MAX_WORKERS = 8
+REQUEST_JITTER = 0.5
+
+
+def _get_umask():
+    """读取当前的umask（os.umask只能设置新值并返回旧值，需要再设回去）"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# 输出文件的权限，与open()新建的文件相同；模块加载时读取一次，
+# 多线程下载时不必反复修改进程的umask
+FILE_MODE = 0o666 & ~_get_umask()
+
 
 def clean_filename(filename):
     """
@@ -14,69 +61,217 @@ def clean_filename(filename):
     Returns:
         str: 清理后的文件名
     """
-    # 移除Windows不合法的字符
-    cleaned = re.sub(r'[<>:"/\\|?*\x00-\x1F]', "", filename)
-    # 移除首尾空格
-    cleaned = cleaned.strip()
-    # 如果文件名为空，返回默认名称
-    return cleaned if cleaned else "novel"
+    # 移除不合法字符和首尾空格，为空时返回默认名称
+    return INVALID_FILENAME_CHARS.sub("", filename).strip() or "novel"
+
+
+def fast_unescape(text):
+    """
+    转换HTML实体，结果与html.unescape一致
+
+    先用str.replace替换最常见的几种实体（比正则逐个匹配快得多），
+    剩下的 '&' 都属于 &amp; 时直接替换，否则再交给html.unescape处理剩余部分。
+    替换出的字符都不能构成实体名，不会改变html.unescape对其余实体的解析
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        str: 转换后的文本
+    """
+    if "&" not in text:
+        return text
+    for entity, char in SIMPLE_ENTITIES:
+        if entity in text:
+            text = text.replace(entity, char)
+
+    count = text.count("&")
+    if not count:
+        return text
+    if count == text.count("&amp;"):
+        return text.replace("&amp;", "&")
+    return html.unescape(text)
+
+
+def unescape_chunks(chunks):
+    """
+    逐块转换HTML实体
+
+    如果块尾附近出现 '&'，就把它之后的内容留到下一块一起处理，
+    保证被切断的实体（如 "&am" + "p;"）也能正确转换
+
+    Args:
+        chunks (Iterable[str]): 文本块
+
+    Yields:
+        str: 转换后的文本块
+    """
+    tail = ""
+    for chunk in chunks:
+        text = tail + chunk
+        cut = text.rfind("&", max(0, len(text) - ENTITY_TAIL))
+        if cut == -1:
+            tail = ""
+        else:
+            text, tail = text[:cut], text[cut:]
+        if text:
+            yield fast_unescape(text)
+    if tail:
+        yield fast_unescape(tail)
+
+
+def check_novel_text(chunks):
+    """
+    检查下载内容确实是小说文本，原样输出各个文本块
 
+    服务器出错或限流时也可能返回200状态码的HTML页面或空内容，
+    这类内容一旦写入缓存就会在之后每次运行时被直接使用，必须在写入前拦下
 
-def download_and_process_novel(novel_id):
+    Args:
+        chunks (Iterable[str]): 下载得到的文本块
+
+    Yields:
+        str: 原样输出的文本块
+
+    Raises:
+        ValueError: 内容为空或看起来是HTML页面
+    """
+    checked = False
+    for chunk in chunks:
+        if not checked:
+            head = chunk.lstrip("\ufeff \t\r\n\u3000")
+            if not head:
+                continue
+            if head.startswith("<"):
+                raise ValueError("下载内容是HTML页面而不是小说文本")
+            checked = True
+        yield chunk
+    if not checked:
+        raise ValueError("下载内容为空")
+
+
+def save_to_cache(cache_path, chunks):
+    """
+    原子地写入缓存文件，避免中断时留下不完整的缓存
+
+    Args:
+        cache_path (Path): 缓存文件路径
+        chunks (Iterable[str]): 要写入的文本块
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def copy_atomic(src, dst):
+    """
+    先复制到同目录的临时文件，再替换目标文件，中断时不会留下不完整的文件
+
+    Args:
+        src (Path): 源文件路径
+        dst (str): 目标文件路径
+    """
+    # 临时文件名由mkstemp生成，不会覆盖或删除用户已有的文件
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(dst)), prefix=".tmp_"
+    )
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        # mkstemp创建的文件只有自己可读写，改回普通新文件的权限
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def download_and_process_novel(novel_id, use_cache=True, jitter=0):
     """
     下载并处理wenku8小说
 
     Args:
         novel_id (str): 小说代码/ID
+        use_cache (bool): 是否使用本地缓存，False时强制重新下载
+        jitter (float): 发起请求前随机等待的最长秒数
+
+    Returns:
+        bool: 成功返回True，否则False
     """
     # 构建下载URL
     url = f"https://dl.wenku8.com/down.php?type=utf8&node=1&id={novel_id}"
 
-    try:
-        # 下载小说文件
-        response = requests.get(url)
-        response.raise_for_status()
+    # 生成文件名
+    filename = clean_filename(f"{novel_id}.txt")
+    cache_path = CACHE_DIR / filename
 
-        # 生成文件名
-        filename = clean_filename(f"{novel_id}.txt")
+    try:
+        # 命中缓存时直接复制，跳过网络请求
+        if use_cache and cache_path.exists():
+            copy_atomic(cache_path, filename)
+            print(f"小说处理完成(来自缓存): {filename}")
+            return True
 
-        # 保存原始文件
-        with open(filename, "wb") as f:
-            f.write(response.content)
+        if jitter:
+            time.sleep(random.uniform(0, jitter))
 
+        # 流式下载小说文件，边下载边转换HTML实体，不在内存中保留整本小说
+        # 内容不合格时save_to_cache会删除临时文件，不会留下错误的缓存
+        with SESSION.get(url, stream=True) as response:
+            response.raise_for_status()
+            if "html" in response.headers.get("Content-Type", "").lower():
+                raise ValueError("下载内容是HTML页面而不是小说文本")
+            response.encoding = "utf-8"
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True)
+            save_to_cache(cache_path, unescape_chunks(check_novel_text(chunks)))
         print(f"小说已下载: {filename}")
 
-        # 读取文件内容
-        with open(filename, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        # 转换HTML实体
-        converted_content = html.unescape(content)
-
-        # 写回文件
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(converted_content)
+        copy_atomic(cache_path, filename)
 
         print(f"小说处理完成: {filename}")
+        return True
 
     except requests.RequestException as e:
-        print(f"下载错误: {e}")
-        sys.exit(1)
+        print(f"下载错误 {novel_id}: {e}")
+        return False
     except Exception as e:
-        print(f"处理错误: {e}")
-        sys.exit(1)
+        print(f"处理错误 {novel_id}: {e}")
+        return False
 
 
 def main():
     """主函数 - 处理命令行参数"""
-    if len(sys.argv) != 2:
-        print("用法: dwenku8 <小说代码>")
-        print("示例: dwenku8 1234")
+    args = sys.argv[1:]
+    use_cache = "--no-cache" not in args
+    args = [arg for arg in args if arg != "--no-cache"]
+
+    if not args:
+        print("用法: dwenku8 <小说代码> [小说代码 ...] [--no-cache]")
+        print("示例: dwenku8 1234 5678")
         sys.exit(1)
 
-    # 获取小说ID并处理
-    novel_id = sys.argv[1]
-    download_and_process_novel(novel_id)
+    # 去重后处理，多个小说时用线程池并行下载
+    novel_ids = list(dict.fromkeys(args))
+    if len(novel_ids) == 1:
+        results = [download_and_process_novel(novel_ids[0], use_cache)]
+    else:
+        worker = partial(
+            download_and_process_novel, use_cache=use_cache, jitter=REQUEST_JITTER
+        )
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_WORKERS, len(novel_ids))
+        ) as executor:
+            results = list(executor.map(worker, novel_ids))
+
+    if not all(results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
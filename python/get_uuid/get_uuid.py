@@ -1,25 +1,77 @@
+import os
+import sys
 import uuid
 import pyperclip
 
 
-def generate_uuid():
+def bulk_uuid4(count):
+    """
+    批量生成UUIDv4字符串
+
+    一次读取全部随机字节，再直接设置版本位和变体位，
+    比逐个调用uuid.uuid4()少了UUID对象的构造开销
+
+    Args:
+        count (int): 要生成的数量
+
+    Returns:
+        list[str]: UUID字符串列表
+    """
+    raw = bytearray(os.urandom(16 * count))
+    uuids = []
+    for i in range(0, len(raw), 16):
+        raw[i + 6] = (raw[i + 6] & 0x0F) | 0x40  # 版本号 4
+        raw[i + 8] = (raw[i + 8] & 0x3F) | 0x80  # RFC 4122 变体
+        h = raw[i : i + 16].hex()
+        uuids.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+    return uuids
+
+
+def generate_uuid(count=1):
     """
     生成UUIDv4并复制到剪贴板
 
     UUID (Universally Unique Identifier) 是一个128位的标识符，
     通常用于在分布式系统中唯一标识信息。
     UUIDv4是基于随机数生成的UUID。
+
+    Args:
+        count (int): 生成数量，大于1时每行一个
     """
     # 生成UUIDv4
-    uuid_value = uuid.uuid4()
+    if count > 1:
+        uuid_value = "\n".join(bulk_uuid4(count))
+    else:
+        uuid_value = str(uuid.uuid4())
 
     # 尝试复制到剪贴板，失败时提示手动复制
     try:
-        pyperclip.copy(str(uuid_value))
+        pyperclip.copy(uuid_value)
         print(f"UUID已生成并复制到剪贴板: {uuid_value}")
     except Exception:
         print(f"UUID已生成 (请手动复制): {uuid_value}")
 
 
+def main():
+    """主函数 - 处理命令行参数"""
+    args = sys.argv[1:]
+    count = 0
+    if not args:
+        count = 1
+    elif len(args) == 2 and args[0] == "--count":
+        # 不用str.isdigit()预先判断："²"等字符算作数字，但int()无法转换
+        try:
+            count = int(args[1])
+        except ValueError:
+            pass
+
+    if count < 1:
+        print("用法: getuuid [--count N]")
+        print("示例: getuuid --count 10")
+        sys.exit(1)
+
+    generate_uuid(count)
+
+
 if __name__ == "__main__":
-    generate_uuid()
+    main()
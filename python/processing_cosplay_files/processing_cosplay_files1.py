@@ -10,18 +10,136 @@ Cosplay文件处理脚本1 - 优化版
 """
 
 import os
+import queue
 import subprocess
 import sys
-from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 常量定义（全大写表示常量）
 FIXED_DIRECTORY = r"C:\Users\fortynine\acg\1"
 SEVEN_ZIP_PATH = r"C:\Program Files\7-Zip\7z.exe"
 
+# Windows上启动7z时不创建控制台窗口
+CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
 # 支持的文件类型
 ARCHIVE_EXTENSIONS = (".zip", ".rar", ".7z")
 DELETE_EXTENSIONS = (".webp", ".gif")
 
+# 没有UTF-8标记的ZIP文件名按GBK解码，与中文Windows下7-Zip的行为一致
+ZIP_FILENAME_ENCODING = "gbk"
+
+
+def _make_remove_file():
+    """
+    Windows上直接调用DeleteFileW删除文件，其他系统使用os.remove
+
+    os.remove在Windows上会先查询文件属性再删除，直接调用API少一次系统调用
+    """
+    if os.name != "nt":
+        return os.remove
+
+    import ctypes
+
+    delete_file = ctypes.WinDLL("kernel32", use_last_error=True).DeleteFileW
+    delete_file.argtypes = [ctypes.c_wchar_p]
+    delete_file.restype = ctypes.c_bool
+
+    def remove_file(file_path):
+        if not delete_file(file_path):
+            # WinError会根据错误码生成对应的异常，如PermissionError
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    return remove_file
+
+
+remove_file = _make_remove_file()
+
+
+# 后台打印线程的消息队列，未启动时为None（直接打印）
+_log_queue = None
+
+
+def log(message):
+    """
+    输出一条消息
+
+    后台打印线程运行时只把消息放入队列，工作线程不必等待控制台输出
+    """
+    if _log_queue is None:
+        print(message)
+    else:
+        _log_queue.put(message)
+
+
+@contextmanager
+def background_printer():
+    """在with块内由单独的线程负责打印，退出时输出完剩余消息"""
+    global _log_queue
+
+    def drain(log_queue):
+        while (message := log_queue.get()) is not None:
+            print(message)
+
+    log_queue = queue.SimpleQueue()
+    thread = threading.Thread(target=drain, args=(log_queue,), daemon=True)
+    thread.start()
+    _log_queue = log_queue
+    try:
+        yield
+    finally:
+        _log_queue = None
+        log_queue.put(None)
+        thread.join()
+
+
+def iter_matching(directory, suffixes):
+    """
+    基于os.scandir递归查找指定扩展名的文件
+
+    目录项自带文件类型信息，不必像os.walk那样对每个文件再调用stat
+
+    Args:
+        directory (str): 要搜索的目录
+        suffixes (tuple): 小写的扩展名元组
+
+    Yields:
+        os.DirEntry: 匹配的文件
+    """
+    # 在循环外准备好全小写和全大写两种扩展名，绝大多数文件名无需转换大小写；
+    # 大小写混合的情况只对文件名末尾几个字符转小写，不复制整个文件名
+    scan_suffixes = tuple(e for suffix in suffixes for e in (suffix, suffix.upper()))
+    tail_len = max(map(len, suffixes))
+
+    stack = [directory]
+    while stack:
+        path = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            # 与os.walk一样跳过无法读取的目录，不中断整个处理流程
+            log(f"⚠ 无法读取目录，已跳过 {path}: {e}")
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False) and not entry.is_junction():
+                    stack.append(entry.path)
+                    continue
+                name = entry.name
+                if not (
+                    name.endswith(scan_suffixes)
+                    or name[-tail_len:].lower().endswith(suffixes)
+                ):
+                    continue
+                # 扩展名匹配的目录联接或指向目录的符号链接不是文件，与os.walk一样跳过；
+                # 普通文件的类型已在目录项中，只有这类链接需要额外stat
+                if not entry.is_dir():
+                    yield entry
+
 
 def safe_delete(file_path):
     """
@@ -31,15 +149,112 @@ def safe_delete(file_path):
         file_path (str): 要删除的文件路径
     """
     try:
-        os.remove(file_path)
-        print(f"✓ 已删除: {os.path.basename(file_path)}")
+        remove_file(file_path)
+        log(f"✓ 已删除: {os.path.basename(file_path)}")
     except PermissionError:
         # 如果是权限错误，修改权限后重试
         os.chmod(file_path, 0o666)  # 赋予读写权限
-        os.remove(file_path)
-        print(f"✓ 已删除(修复权限后): {os.path.basename(file_path)}")
+        remove_file(file_path)
+        log(f"✓ 已删除(修复权限后): {os.path.basename(file_path)}")
     except Exception as e:
-        print(f"✗ 删除失败 {os.path.basename(file_path)}: {e}")
+        log(f"✗ 删除失败 {os.path.basename(file_path)}: {e}")
+
+
+def extract_zip(file_path, root_dir):
+    """
+    在进程内直接解压ZIP文件，省去启动7-Zip进程的开销
+
+    Args:
+        file_path (str): ZIP文件完整路径
+        root_dir (str): 解压目标目录
+    """
+    try:
+        zip_ref = zipfile.ZipFile(file_path, metadata_encoding=ZIP_FILENAME_ENCODING)
+    except UnicodeDecodeError:
+        zip_ref = zipfile.ZipFile(file_path)
+
+    with zip_ref:
+        zip_ref.extractall(root_dir)
+
+
+def try_extract_zip(file_path, root_dir):
+    """
+    ZIP优先用zipfile解压，遇到加密或不支持的压缩算法时返回False交给7z
+
+    Returns:
+        bool: 是否已在进程内解压完成
+    """
+    if not file_path.lower().endswith(".zip"):
+        return False
+    try:
+        extract_zip(file_path, root_dir)
+        return True
+    except (zipfile.BadZipFile, NotImplementedError, RuntimeError):
+        return False
+
+
+def run_7z_command(cmd):
+    """
+    运行7z命令，错误信息逐行实时输出
+
+    不等7z退出再一次性取出错误信息，大文件解压中途出错时能立即看到
+
+    Args:
+        cmd (list): 完整的命令行参数
+
+    Raises:
+        subprocess.CalledProcessError: 7z返回非零退出码
+    """
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        creationflags=CREATION_FLAGS,
+    ) as proc:
+        # 标准输出已丢弃，只有一个管道，直接在当前线程读取不会死锁
+        for line in proc.stderr:
+            if line := line.rstrip():
+                log(f"  7z: {line}")
+        returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def run_7z(file_paths, root_dir):
+    """
+    用一个7z进程解压一个或多个压缩文件
+
+    多个文件时写入列表文件，通过 -an -ai@列表文件 一次性交给7z，
+    避免每个压缩包都启动一次进程
+
+    Args:
+        file_paths (list): 压缩文件路径列表
+        root_dir (str): 解压目标目录
+    """
+    # 参数说明:
+    # x: 解压并保持目录结构
+    # -o: 指定输出目录
+    # -y: 自动确认所有提示
+    # -bso0 -bsp0: 不输出常规信息和进度，只有错误信息经过管道
+    # 多个文件时:
+    # -an -ai@列表文件: 压缩包名全部来自列表文件（只写 @列表文件 会被当成压缩包名）
+    # -scsUTF-8: 列表文件使用UTF-8编码
+    options = [f"-o{root_dir}", "-y", "-bso0", "-bsp0"]
+    if len(file_paths) == 1:
+        run_7z_command([SEVEN_ZIP_PATH, "x", file_paths[0], *options])
+        return
+
+    fd, list_path = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(file_paths))
+        run_7z_command(
+            [SEVEN_ZIP_PATH, "x", "-an", f"-ai@{list_path}", "-scsUTF-8", *options]
+        )
+    finally:
+        os.remove(list_path)
 
 
 def extract_single_archive(file_path, root_dir):
@@ -51,72 +266,110 @@ def extract_single_archive(file_path, root_dir):
         root_dir (str): 解压目标目录
     """
     try:
-        print(f"正在解压: {os.path.basename(file_path)}")
-
-        # 使用7z解压文件
-        # 参数说明:
-        # x: 解压并保持目录结构
-        # -o: 指定输出目录
-        # -y: 自动确认所有提示
-        subprocess.run(
-            [SEVEN_ZIP_PATH, "x", file_path, f"-o{root_dir}", "-y"],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        log(f"正在解压: {os.path.basename(file_path)}")
+
+        if not try_extract_zip(file_path, root_dir):
+            run_7z([file_path], root_dir)
 
-        print(f"✓ 解压成功: {os.path.basename(file_path)}")
+        log(f"✓ 解压成功: {os.path.basename(file_path)}")
 
         # 解压成功后删除原文件
         safe_delete(file_path)
         return True
 
     except subprocess.CalledProcessError as e:
-        print(f"✗ 解压失败 {os.path.basename(file_path)}: {e.stderr or e}")
+        log(f"✗ 解压失败 {os.path.basename(file_path)}: 7z退出码 {e.returncode}")
         return False
     except Exception as e:
-        print(f"✗ 处理失败 {os.path.basename(file_path)}: {e}")
+        log(f"✗ 处理失败 {os.path.basename(file_path)}: {e}")
         return False
 
 
-def extract_archives(directory):
+def extract_7z_batch(file_paths, root_dir):
     """
-    批量解压目录中的所有压缩文件
+    用一次7z调用解压同一目录下的一组非ZIP压缩文件
+
+    7z批量解压失败时无法确定是哪个文件出错，只能改为逐个解压；
+    已经解压成功的文件会被重新解压一次（-y覆盖），结果不受影响
 
     Args:
-        directory (str): 要处理的目录路径
+        file_paths (list): 压缩文件路径列表
+        root_dir (str): 解压目标目录
+
+    Returns:
+        int: 成功解压的文件数
+    """
+    if len(file_paths) == 1:
+        return int(extract_single_archive(file_paths[0], root_dir))
+
+    try:
+        for file_path in file_paths:
+            log(f"正在解压: {os.path.basename(file_path)}")
+        run_7z(file_paths, root_dir)
+    except Exception:
+        log(f"批量解压未全部成功，逐个重试: {root_dir}")
+        return sum(extract_single_archive(path, root_dir) for path in file_paths)
+
+    for file_path in file_paths:
+        log(f"✓ 解压成功: {os.path.basename(file_path)}")
+        safe_delete(file_path)
+    return len(file_paths)
+
+
+def extract_archives(archive_groups):
+    """
+    批量解压压缩文件
+
+    ZIP在进程内解压，不需要启动进程，每个文件单独作为一个任务；
+    其余文件按目录交给7z，目录中的文件多于线程数时才合并成几批，
+    既减少7z进程启动次数，又保持与线程数相同的并行度
+
+    Args:
+        archive_groups (dict): {解压目标目录: [压缩文件路径, ...]}
+
+    Returns:
+        int: 成功解压的文件数
     """
     if not os.path.exists(SEVEN_ZIP_PATH):
         print("错误: 未找到7-Zip程序，请检查安装路径")
-        return
-
-    # 收集所有压缩文件
-    archive_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(ARCHIVE_EXTENSIONS):
-                archive_files.append((os.path.join(root, file), root))
+        return 0
 
-    if not archive_files:
+    total = sum(len(file_paths) for file_paths in archive_groups.values())
+    if not total:
         print("未找到压缩文件")
-        return
+        return 0
 
-    print(f"找到 {len(archive_files)} 个压缩文件，开始解压...")
+    print(f"找到 {total} 个压缩文件，开始解压...")
 
-    # 使用线程池并行处理
     # min(32, cpu_count + 4): 合理的线程数设置
+    max_workers = min(32, (os.cpu_count() or 1) + 4)
     successful = 0
-    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+    with (
+        background_printer(),
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+    ):
         # 提交所有解压任务
-        futures = [
-            executor.submit(extract_single_archive, file_path, root)
-            for file_path, root in archive_files
-        ]
+        futures = []
+        for root, file_paths in archive_groups.items():
+            others = []
+            for file_path in file_paths:
+                if file_path.lower().endswith(".zip"):
+                    futures.append(
+                        executor.submit(extract_single_archive, file_path, root)
+                    )
+                else:
+                    others.append(file_path)
+
+            batch_count = min(max_workers, len(others))
+            for i in range(batch_count):
+                batch = others[i::batch_count]
+                futures.append(executor.submit(extract_7z_batch, batch, root))
 
-        # 统计成功数量
-        successful = sum(1 for future in futures if future.result())
+        # 按完成顺序统计成功数量，不必等待排在前面的慢任务
+        successful = sum(future.result() for future in as_completed(futures))
 
-    print(f"解压完成: 成功 {successful}/{len(archive_files)}")
+    print(f"解压完成: 成功 {successful}/{total}")
+    return successful
 
 
 def delete_unwanted_files(directory):
@@ -125,15 +378,42 @@ def delete_unwanted_files(directory):
 
     Args:
         directory (str): 要处理的目录路径
+
+    Returns:
+        int: 删除的文件数
     """
     deleted_count = 0
 
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(DELETE_EXTENSIONS):
-                file_path = os.path.join(root, file)
-                safe_delete(file_path)
-                deleted_count += 1
+    for entry in iter_matching(directory, DELETE_EXTENSIONS):
+        safe_delete(entry.path)
+        deleted_count += 1
+
+    return deleted_count
+
+
+def process_directory(directory):
+    """
+    解压所有压缩文件并删除不需要的文件类型
+
+    一次遍历同时完成分类：压缩文件按目录分组等待解压，不需要的文件立即删除。
+    只有确实解压出了新文件时，才需要再遍历一次清理解压结果
+
+    Args:
+        directory (str): 要处理的目录路径
+    """
+    archive_groups = {}
+    deleted_count = 0
+
+    for entry in iter_matching(directory, ARCHIVE_EXTENSIONS + DELETE_EXTENSIONS):
+        if entry.name.lower().endswith(ARCHIVE_EXTENSIONS):
+            root = os.path.dirname(entry.path)
+            archive_groups.setdefault(root, []).append(entry.path)
+        else:
+            safe_delete(entry.path)
+            deleted_count += 1
+
+    if extract_archives(archive_groups):
+        deleted_count += delete_unwanted_files(directory)
 
     print(f"删除完成: 共删除 {deleted_count} 个文件")
 
@@ -147,14 +427,17 @@ def main():
         print(f"错误: 目录不存在 - {FIXED_DIRECTORY}")
         sys.exit(1)
 
-    # 用户确认
-    print("=== Cosplay文件处理脚本 ===")
-    print(f"目标目录: {FIXED_DIRECTORY}")
-    print("即将执行:")
-    print("1. 解压所有压缩文件 (ZIP/RAR/7Z)")
-    print("2. 删除解压后的压缩文件")
-    print("3. 删除 WEBP 和 GIF 文件")
-    print("\n⚠️  警告: 此操作不可撤销!")
+    # 用户确认，提示信息拼成一段一次性输出
+    banner = [
+        "=== Cosplay文件处理脚本 ===",
+        f"目标目录: {FIXED_DIRECTORY}",
+        "即将执行:",
+        "1. 解压所有压缩文件 (ZIP/RAR/7Z)",
+        "2. 删除解压后的压缩文件",
+        "3. 删除 WEBP 和 GIF 文件",
+        "\n⚠️  警告: 此操作不可撤销!",
+    ]
+    print("\n".join(banner))
 
     # 更友好的确认方式
     confirmation = input("\n请输入 'YES' 确认执行: ").strip().upper()
@@ -165,8 +448,7 @@ def main():
 
     # 执行处理流程
     print("\n开始处理...")
-    extract_archives(FIXED_DIRECTORY)
-    delete_unwanted_files(FIXED_DIRECTORY)
+    process_directory(FIXED_DIRECTORY)
     print("\n✅ 所有操作完成!")
 
 
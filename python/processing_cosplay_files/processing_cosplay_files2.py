@@ -9,40 +9,118 @@ Cosplay文件处理脚本2 - 优化版
 5. 添加详细注释，便于新手理解
 """
 
+import errno
 import os
 import subprocess
 import sys
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 常量定义
 FIXED_DIRECTORY = r"C:\Users\fortynine\acg\1"
 SEVEN_ZIP_PATH = r"C:\Program Files\7-Zip\7z.exe"
 
+# 需要保留的文件扩展名（预先准备大小写两种形式，避免对每个文件名转小写）
+KEEP_EXTENSION = ".webp"
+KEEP_SUFFIXES = (KEEP_EXTENSION, KEEP_EXTENSION.upper())
 
-def safe_delete(file_path):
+# 同时运行的7z压缩进程数（每个7z进程自身已使用多线程）
+COMPRESS_WORKERS = 1
+
+# Windows上启动7z时不创建控制台窗口
+CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
+
+def _make_remove_file():
+    """
+    Windows上直接调用DeleteFileW删除文件，其他系统使用os.remove
+
+    os.remove在Windows上会先查询文件属性再删除，直接调用API少一次系统调用
+    """
+    if os.name != "nt":
+        return os.remove
+
+    import ctypes
+
+    delete_file = ctypes.WinDLL("kernel32", use_last_error=True).DeleteFileW
+    delete_file.argtypes = [ctypes.c_wchar_p]
+    delete_file.restype = ctypes.c_bool
+
+    def remove_file(file_path):
+        if not delete_file(file_path):
+            # WinError会根据错误码生成对应的异常，如PermissionError
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    return remove_file
+
+
+remove_file = _make_remove_file()
+
+
+def iter_files(directory):
+    """
+    基于os.scandir递归列出所有文件
+
+    目录项自带文件类型信息，不必像os.walk那样对每个文件再调用stat
+
+    Args:
+        directory (str): 要搜索的目录
+
+    Yields:
+        os.DirEntry: 文件条目
+    """
+    stack = [directory]
+    while stack:
+        path = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            # 与os.walk一样跳过无法读取的目录，不中断整个处理流程
+            print(f"⚠ 无法读取目录，已跳过 {path}: {e}")
+            continue
+        with it:
+            for entry in it:
+                # 目录联接（junction）和指向目录的符号链接与os.walk一样不当作文件，
+                # 也不进入，不会删除链接目标里的文件
+                if entry.is_dir(follow_symlinks=False) and not entry.is_junction():
+                    stack.append(entry.path)
+                elif not entry.is_dir():
+                    yield entry
+
+
+def is_keep_file(name):
+    """判断是否为需要保留的.webp文件（不区分大小写）"""
+    if name.endswith(KEEP_SUFFIXES):
+        return True
+    return name[-len(KEEP_EXTENSION) :].lower() == KEEP_EXTENSION
+
+
+def safe_delete(entry):
     """
     安全删除文件或文件夹，处理权限问题
 
     Args:
-        file_path (str): 要删除的文件或文件夹路径
+        entry (os.DirEntry): 要删除的文件或文件夹条目，
+            直接使用其缓存的类型信息，无需再调用stat判断
     """
+    name = entry.name
+    is_dir = entry.is_dir(follow_symlinks=False)
     try:
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-            print(f"✓ 删除文件: {os.path.basename(file_path)}")
-        elif os.path.isdir(file_path):
-            os.rmdir(file_path)
-            print(f"✓ 删除空文件夹: {os.path.basename(file_path)}")
+        if is_dir:
+            os.rmdir(entry.path)
+            print(f"✓ 删除空文件夹: {name}")
+        else:
+            remove_file(entry.path)
+            print(f"✓ 删除文件: {name}")
     except PermissionError:
         # 处理权限问题
-        os.chmod(file_path, 0o666)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
+        os.chmod(entry.path, 0o666)
+        if is_dir:
+            os.rmdir(entry.path)
         else:
-            os.rmdir(file_path)
-        print(f"✓ 删除(修复权限): {os.path.basename(file_path)}")
+            remove_file(entry.path)
+        print(f"✓ 删除(修复权限): {name}")
     except Exception as e:
-        print(f"✗ 删除失败 {os.path.basename(file_path)}: {e}")
+        print(f"✗ 删除失败 {name}: {e}")
 
 
 def delete_non_webp_files(directory):
@@ -54,16 +132,75 @@ def delete_non_webp_files(directory):
     """
     deleted_count = 0
 
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if not file.lower().endswith(".webp"):
-                file_path = os.path.join(root, file)
-                safe_delete(file_path)
-                deleted_count += 1
+    for entry in iter_files(directory):
+        if not is_keep_file(entry.name):
+            safe_delete(entry)
+            deleted_count += 1
 
     print(f"删除完成: 共删除 {deleted_count} 个非.webp文件")
 
 
+def folders_by_depth(directory):
+    """
+    一次遍历收集所有子文件夹，按深度分组
+
+    Args:
+        directory (str): 要处理的目录路径
+
+    Returns:
+        dict: {深度: [文件夹路径, ...]}，第一层子文件夹深度为1
+    """
+    levels = {}
+    stack = [(directory, 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError:
+            # iter_files已经提示过无法读取的目录，这里直接跳过
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False) and not entry.is_junction():
+                    levels.setdefault(depth + 1, []).append(entry.path)
+                    stack.append((entry.path, depth + 1))
+    return levels
+
+
+def remove_empty_folder(folder_path):
+    """
+    尝试删除一个空文件夹
+
+    直接调用os.rmdir，文件夹非空时会失败，不必先列出内容检查
+
+    Args:
+        folder_path (str): 文件夹路径
+
+    Returns:
+        bool: 是否已删除
+    """
+    name = os.path.basename(folder_path)
+    try:
+        os.rmdir(folder_path)
+    except PermissionError:
+        # 处理权限问题
+        try:
+            os.chmod(folder_path, 0o666)
+            os.rmdir(folder_path)
+        except OSError as e:
+            print(f"✗ 删除失败 {name}: {e}")
+            return False
+        print(f"✓ 删除(修复权限): {name}")
+        return True
+    except OSError as e:
+        if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+            print(f"✗ 检查文件夹失败 {name}: {e}")
+        return False
+
+    print(f"✓ 删除空文件夹: {name}")
+    return True
+
+
 def remove_empty_folders(directory):
     """
     递归删除所有空文件夹
@@ -72,18 +209,13 @@ def remove_empty_folders(directory):
         directory (str): 要处理的目录路径
     """
     deleted_count = 0
+    levels = folders_by_depth(directory)
 
-    # 自底向上遍历，确保先删除深层空文件夹
-    for root, dirs, _ in sorted(os.walk(directory, topdown=False), reverse=True):
-        for dir_name in dirs:
-            folder_path = os.path.join(root, dir_name)
-            try:
-                # 检查文件夹是否为空
-                if not os.listdir(folder_path):
-                    safe_delete(folder_path)
-                    deleted_count += 1
-            except Exception as e:
-                print(f"✗ 检查文件夹失败 {os.path.basename(folder_path)}: {e}")
+    # 从最深一层开始逐层处理，同一层的文件夹互不影响，可以并行删除；
+    # 处理完一层再处理上一层，保证父文件夹在子文件夹删除之后才检查
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+        for depth in sorted(levels, reverse=True):
+            deleted_count += sum(executor.map(remove_empty_folder, levels[depth]))
 
     print(f"空文件夹清理完成: 共删除 {deleted_count} 个空文件夹")
 
@@ -101,11 +233,25 @@ def compress_single_folder(folder_path, output_path):
 
         # 使用7z压缩
         # a: 添加文件到压缩包
-        result = subprocess.run(
-            [SEVEN_ZIP_PATH, "a", output_path, folder_path],
+        # -mx=1: 最快压缩级别（.webp本身已压缩，高压缩级别几乎没有收益）
+        # -mmt=on: 单个7z进程使用所有CPU核心
+        # -bso0 -bsp0: 不输出常规信息和进度，只有错误信息经过管道
+        subprocess.run(
+            [
+                SEVEN_ZIP_PATH,
+                "a",
+                output_path,
+                folder_path,
+                "-mx=1",
+                "-mmt=on",
+                "-bso0",
+                "-bsp0",
+            ],
             check=True,
-            capture_output=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             text=True,
+            creationflags=CREATION_FLAGS,
         )
 
         print(f"✓ 压缩成功: {os.path.basename(folder_path)}")
@@ -132,11 +278,11 @@ def compress_subfolders(directory):
 
     # 收集所有第一层子文件夹
     subfolders = []
-    for item in os.listdir(directory):
-        item_path = os.path.join(directory, item)
-        if os.path.isdir(item_path):
-            output_path = os.path.join(directory, f"{item}.7z")
-            subfolders.append((item_path, output_path))
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_dir():
+                output_path = os.path.join(directory, f"{entry.name}.7z")
+                subfolders.append((entry.path, output_path))
 
     if not subfolders:
         print("未找到需要压缩的子文件夹")
@@ -144,17 +290,17 @@ def compress_subfolders(directory):
 
     print(f"找到 {len(subfolders)} 个子文件夹，开始压缩...")
 
-    # 使用线程池并行压缩
+    # 7z已启用多线程压缩，同时运行多个7z只会互相争抢CPU
     successful = 0
-    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+    with ThreadPoolExecutor(max_workers=COMPRESS_WORKERS) as executor:
         # 提交所有压缩任务
         futures = [
             executor.submit(compress_single_folder, folder_path, output_path)
             for folder_path, output_path in subfolders
         ]
 
-        # 统计成功数量
-        successful = sum(1 for future in futures if future.result())
+        # 按完成顺序统计成功数量，不必等待排在前面的慢任务
+        successful = sum(1 for future in as_completed(futures) if future.result())
 
     print(f"压缩完成: 成功 {successful}/{len(subfolders)}")
 
@@ -168,14 +314,17 @@ def main():
         print(f"错误: 目录不存在 - {FIXED_DIRECTORY}")
         sys.exit(1)
 
-    # 用户确认
-    print("=== Cosplay文件处理脚本2 ===")
-    print(f"目标目录: {FIXED_DIRECTORY}")
-    print("即将执行:")
-    print("1. 删除所有非.webp文件")
-    print("2. 删除所有空文件夹")
-    print("3. 将子文件夹压缩为.7z格式")
-    print("\n⚠️  警告: 此操作不可撤销!")
+    # 用户确认，提示信息拼成一段一次性输出
+    banner = [
+        "=== Cosplay文件处理脚本2 ===",
+        f"目标目录: {FIXED_DIRECTORY}",
+        "即将执行:",
+        "1. 删除所有非.webp文件",
+        "2. 删除所有空文件夹",
+        "3. 将子文件夹压缩为.7z格式",
+        "\n⚠️  警告: 此操作不可撤销!",
+    ]
+    print("\n".join(banner))
 
     # 更友好的确认方式
     confirmation = input("\n请输入 'CONFIRM' 确认执行: ").strip().upper()
@@ -4,142 +4,470 @@ SAO IP工具 - 优化版
 特点：代码简洁、新手友好、功能完整
 """
 
+import os
 import sys
+import errno
+import asyncio
 import socket
+import struct
+import select
+import functools
 import ipaddress
 import subprocess
 import time
 import platform
-from concurrent.futures import ThreadPoolExecutor
+from array import array
+
+# ICMP报文类型
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# TCP扫描同时进行的最大连接数
+TCP_CONCURRENCY = 1024
+# 为标准输入输出、事件循环等预留的文件描述符数
+FD_RESERVE = 64
+LINGER_RESET = struct.pack("ii", 1, 0)
+
+# 一次最多扫描的地址数（一个/12），更大的网段会被拒绝
+MAX_ADDRESSES = 1 << 20
+
+# 合法的TCP端口范围
+MIN_PORT = 1
+MAX_PORT = 65535
+
+# 系统相关的参数只在导入时计算一次，避免每次ping都调用platform.system()
+IS_WINDOWS = platform.system() == "Windows"
+PING_PREFIX = ["ping", "-n", "1", "-w"] if IS_WINDOWS else ["ping", "-c", "1", "-W"]
+# IPv6地址没有ICMP套接字扫描，总是调用ping；Windows和Linux的ping用 -6 指定IPv6
+PING6_PREFIX = [PING_PREFIX[0], "-6", *PING_PREFIX[1:]]
+PING_CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if IS_WINDOWS else 0
+# 同时运行的ping进程数，Windows上降低并发数以避免句柄问题
+PING_CONCURRENCY = 50 if IS_WINDOWS else 100
+
+# 原始套接字会收到本机所有的ICMP报文，用进程号作标识符，区分其他ping程序的应答
+ICMP_IDENT = os.getpid() & 0xFFFF
+# Linux的非特权ICMP套接字由内核改写标识符并只投递本套接字的应答，无需再比较；
+# macOS等系统的非特权ICMP套接字保留标识符，需要与原始套接字一样比较
+DGRAM_FILTERS_IDENT = sys.platform.startswith("linux")
+
+# ICMP扫描时同时在途（已发送、未收到应答也未超时）的最大请求数
+ICMP_WINDOW = 1024
+# 发送暂时失败（缓冲区满、ENOBUFS等）时等待多久再重试，单位秒
+SEND_RETRY_DELAY = 0.01
+SEND_RETRY_ERRNOS = frozenset(
+    getattr(errno, name)
+    for name in (
+        "EAGAIN",
+        "EWOULDBLOCK",
+        "EINTR",
+        "ENOBUFS",
+        "WSAEWOULDBLOCK",
+        "WSAENOBUFS",
+    )
+    if hasattr(errno, name)
+)
 
 
 def parse_ports(port_str):
-    """解析端口字符串，支持逗号分隔和范围表示"""
-    ports = []
+    """
+    解析端口字符串，支持逗号分隔和范围表示
+
+    重复的端口只保留一个，结果按升序存入array('H')，每个端口只占2字节
+    """
+    ports = set()
     for part in port_str.split(","):
         if "-" in part:
             start, end = map(int, part.split("-"))
-            ports.extend(range(start, end + 1))
+            ports.update(range(start, end + 1))
         else:
-            ports.append(int(part))
-    return ports
+            ports.add(int(part))
+    if ports and not (MIN_PORT <= min(ports) and max(ports) <= MAX_PORT):
+        raise ValueError(f"端口必须在 {MIN_PORT}-{MAX_PORT} 之间")
+    return array("H", sorted(ports))
 
 
-def ping_ip(ip, timeout=1):
-    """使用ICMP协议ping指定IP地址"""
-    try:
-        # 根据操作系统选择ping参数
-        param = (
-            ["-n", "1", "-w", str(timeout * 1000)]
-            if platform.system() == "Windows"
-            else ["-c", "1", "-W", str(timeout)]
-        )
-        cmd = ["ping"] + param + [str(ip)]
+def icmp_checksum(data):
+    """计算ICMP校验和（16位反码求和）"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident, seq):
+    """构造ICMP回显请求报文"""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    payload = b"saoip"
+    checksum = icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+@functools.cache
+def icmp_socket_type():
+    """
+    检测可用的ICMP套接字类型
+
+    优先使用原始套接字（需要管理员/root权限），
+    其次使用Linux/macOS的非特权ICMP套接字（SOCK_DGRAM），都不可用时返回None
+    """
+    for sock_type in (socket.SOCK_RAW, socket.SOCK_DGRAM):
+        try:
+            socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP).close()
+            return sock_type
+        except OSError:
+            continue
+    return None
+
+
+def parse_echo_reply(data):
+    """
+    解析收到的ICMP报文
+
+    Returns:
+        回显应答的(标识符, 序号)；不是回显应答时返回None
+    """
+    # 原始套接字和macOS的非特权ICMP套接字收到的数据带有IP头，需要跳过；
+    # 首字节高4位为4说明是IPv4头（ICMP类型不会是64~79）
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0F) * 4 :]
+    if len(data) < 8:
+        return None
+    icmp_type, _, _, reply_id, reply_seq = struct.unpack("!BBHHH", data[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return reply_id, reply_seq
+
+
+def _read_echo_replies(sock, sock_type, ident, pending, timeout_ns):
+    """
+    读出套接字中已经到达的全部回显应答
+
+    Args:
+        pending (dict): {(ip, 序号): 发送时间ns}，收到应答的条目会被移除
+        timeout_ns (int): 超时时间（纳秒）
+
+    Yields:
+        (ip, 响应时间ns)
+    """
+    check_ident = sock_type == socket.SOCK_RAW or not DGRAM_FILTERS_IDENT
+    while True:
+        try:
+            data, addr = sock.recvfrom(1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            # 某些系统会把目标不可达等错误报告到套接字上，忽略后继续读取
+            continue
+        received = time.perf_counter_ns()
+        reply = parse_echo_reply(data)
+        if reply is None:
+            continue
+        reply_id, reply_seq = reply
+        if reply_id != ident and check_ident:
+            continue
+        sent = pending.pop((addr[0], reply_seq), None)
+        # 超过超时时间才到达的应答按不通处理，与逐个ping的结果保持一致
+        if sent is not None and received - sent <= timeout_ns:
+            yield addr[0], received - sent
+
+
+def _expire_pending(pending, timeout_ns):
+    """
+    移除已经超时的在途请求
+
+    pending按发送顺序插入，最早发送的在最前面，遇到未超时的条目即可停止
+    """
+    now = time.perf_counter_ns()
+    while pending:
+        key = next(iter(pending))
+        if now - pending[key] <= timeout_ns:
+            break
+        del pending[key]
+
+
+def icmp_sweep(ips, timeout=1):
+    """
+    用同一个ICMP套接字扫描多个IP
+
+    依次发出回显请求，发送间隙读取已到达的应答，最后统一等待剩余应答，
+    总耗时约为发送时间加一次超时，而不是每个IP各等一次。
+    同时在途的请求不超过ICMP_WINDOW个，满了先等应答或超时腾出位置；
+    发送缓冲区满或ENOBUFS（局域网扫描时邻居表/ARP队列已满）时稍等后重试，
+    不把暂时发不出去的IP当作不通
+
+    Args:
+        ips (iterable): 字符串形式的IP地址
+
+    Yields:
+        (ip, 响应时间ns)：按应答到达的顺序输出连通的IP
+    """
+    sock_type = icmp_socket_type()
+    timeout_ns = int(timeout * 1_000_000_000)
+    ident = ICMP_IDENT
+    pending = {}
+
+    with socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP) as sock:
+        sock.setblocking(False)
+        for index, ip in enumerate(ips):
+            # 在途请求已满：等到最早的请求超时或有应答到达，再继续发送
+            while len(pending) >= ICMP_WINDOW:
+                oldest = next(iter(pending.values()))
+                wait_ns = oldest + timeout_ns - time.perf_counter_ns()
+                if wait_ns > 0:
+                    select.select([sock], [], [], wait_ns / 1_000_000_000)
+                yield from _read_echo_replies(
+                    sock, sock_type, ident, pending, timeout_ns
+                )
+                _expire_pending(pending, timeout_ns)
+
+            seq = index & 0xFFFF
+            packet = build_echo_request(ident, seq)
+            give_up = time.perf_counter_ns() + timeout_ns
+            while True:
+                try:
+                    sock.sendto(packet, (ip, 0))
+                except OSError as e:
+                    # 网络不可达等错误视为不通；暂时性错误在超时时间内重试
+                    if e.errno not in SEND_RETRY_ERRNOS:
+                        break
+                    if time.perf_counter_ns() >= give_up:
+                        break
+                    select.select([sock], [], [], SEND_RETRY_DELAY)
+                    yield from _read_echo_replies(
+                        sock, sock_type, ident, pending, timeout_ns
+                    )
+                    continue
+                pending[ip, seq] = time.perf_counter_ns()
+                break
+            yield from _read_echo_replies(sock, sock_type, ident, pending, timeout_ns)
 
-        start_time = time.time()
+        deadline = time.perf_counter() + timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([sock], [], [], remaining)
+            if ready:
+                yield from _read_echo_replies(
+                    sock, sock_type, ident, pending, timeout_ns
+                )
+
+
+async def ping_ip(ip, timeout=1, version=4):
+    """
+    调用系统ping命令测试指定IP地址
+
+    当前环境不支持ICMP套接字或扫描IPv6地址时使用，子进程由事件循环等待，不占用线程
+    """
+    # Windows的超时单位为毫秒，其他系统为秒
+    wait = str(int(timeout * 1000)) if IS_WINDOWS else str(timeout)
+    start_time = time.perf_counter_ns()
+    try:
         # 执行ping命令并隐藏输出
-        result = subprocess.run(
-            cmd,
+        proc = await asyncio.create_subprocess_exec(
+            *(PING6_PREFIX if version == 6 else PING_PREFIX),
+            wait,
+            ip,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
-            creationflags=subprocess.CREATE_NO_WINDOW
-            if platform.system() == "Windows"
-            else 0,
+            creationflags=PING_CREATION_FLAGS,
         )
-        response_time = (time.time() - start_time) * 1000
-
-        return (True, response_time) if result.returncode == 0 else (False, None)
-    except Exception:
+        returncode = await proc.wait()
+    except OSError:
         return False, None
 
+    response_time = time.perf_counter_ns() - start_time
+    return (True, response_time) if returncode == 0 else (False, None)
 
-def tcp_connect(ip, port, timeout=1):
-    """使用TCP连接测试指定IP的端口"""
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
 
-        start_time = time.time()
-        result = sock.connect_ex((str(ip), port))
-        response_time = (time.time() - start_time) * 1000
-        sock.close()
+async def tcp_connect(ip, port, timeout=1):
+    """
+    使用TCP连接测试指定IP的端口
 
-        return (True, response_time) if result == 0 else (False, None)
-    except Exception:
+    ip 为调用方已经转换好的字符串，同一IP的所有端口共用，这里不再转换
+    """
+    start_time = time.perf_counter_ns()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
         return False, None
 
+    response_time = time.perf_counter_ns() - start_time
+    # SO_LINGER(1, 0): 关闭时直接发送RST，不留下大量TIME_WAIT连接占用本地端口
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_RESET)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True, response_time
+
+
+def tcp_concurrency(target_count):
+    """
+    根据目标数量和进程可打开的文件描述符数确定TCP并发连接数
+
+    目标较少时并发数不超过目标数，不创建空闲的工作协程；
+    Linux/macOS默认的软限制常为1024，同时打开TCP_CONCURRENCY个套接字会因
+    EMFILE连接失败而误报端口关闭；先尝试把软限制提高到够用，仍不够时降低并发数
+    """
+    concurrency = max(1, min(TCP_CONCURRENCY, target_count))
+    try:
+        import resource
+    except ImportError:
+        # Windows没有该限制
+        return concurrency
+
+    needed = concurrency + FD_RESERVE
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        new_soft = needed if hard == resource.RLIM_INFINITY else min(hard, needed)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            soft = new_soft
+        except (ValueError, OSError):
+            pass
+    if soft == resource.RLIM_INFINITY:
+        return concurrency
+    return max(1, min(concurrency, soft - FD_RESERVE))
+
 
 def parse_ip_range(ip_str):
-    """解析IP地址或CIDR格式的IP段"""
+    """
+    解析IP地址或CIDR格式的IP段，支持IPv4和IPv6
+
+    返回(IP版本, 整数形式的IP范围)，不为每个地址创建IPv4Address/IPv6Address对象，
+    扫描时再用 format_ips 转换成字符串；地址无效或网段过大时范围为空
+    """
     try:
         network = ipaddress.ip_network(ip_str, strict=False)
-        return list(network.hosts())
     except ValueError:
-        try:
-            return [ipaddress.ip_address(ip_str)]
-        except ValueError:
-            print(f"错误: 无效的IP地址格式 '{ip_str}'")
-            return []
+        print(f"错误: 无效的IP地址格式 '{ip_str}'")
+        return 4, range(0)
+
+    # 整数范围本身不占内存，但/8这样的网段多半是输错了，扫描会持续很久
+    if network.num_addresses > MAX_ADDRESSES:
+        print(
+            f"错误: 网段过大 '{ip_str}' ({network.num_addresses} 个地址，"
+            f"最多 {MAX_ADDRESSES} 个)"
+        )
+        return network.version, range(0)
+
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    # 与 network.hosts() 一致：IPv4的/31和/32之外排除网络地址和广播地址，
+    # IPv6的/127和/128之外排除子网路由器任播地址（即网络地址）
+    if network.version == 4:
+        if network.prefixlen < 31:
+            first, last = first + 1, last - 1
+    elif network.prefixlen < 127:
+        first += 1
+    return network.version, range(first, last + 1)
+
+
+def format_ipv4(ip_int):
+    """把整数形式的IPv4地址转换成点分十进制字符串"""
+    return socket.inet_ntoa(ip_int.to_bytes(4, "big"))
+
+
+def format_ipv6(ip_int):
+    """把整数形式的IPv6地址转换成压缩形式的字符串，如 fd00::1"""
+    return socket.inet_ntop(socket.AF_INET6, ip_int.to_bytes(16, "big"))
 
 
-def scan_icmp(ips):
+def format_ips(ips, version):
+    """按需把整数形式的IP逐个转换成字符串"""
+    return map(format_ipv6 if version == 6 else format_ipv4, ips)
+
+
+def format_ms(response_time):
+    """把纳秒形式的响应时间格式化成毫秒，只在输出结果时调用"""
+    return f"{response_time / 1_000_000:.2f} ms"
+
+
+def scan_icmp(ips, version=4):
     """使用ICMP协议扫描IP地址列表"""
     print("ICMP扫描中...")
     print("-" * 40)
 
-    def worker(ip):
-        is_alive, response_time = ping_ip(ip)
-        if is_alive:
-            print(f"IP: {ip} 通 ({response_time:.2f} ms)")
+    # 支持ICMP套接字时用一个套接字完成整个网段的扫描（只实现了IPv4的回显报文）
+    if version == 4 and icmp_socket_type() is not None:
+        for ip, response_time in icmp_sweep(format_ips(ips, version)):
+            print(f"IP: {ip} 通 ({format_ms(response_time)})")
+        return
+
+    async def worker(targets):
+        for ip in targets:
+            is_alive, response_time = await ping_ip(ip, version=version)
+            if is_alive:
+                print(f"IP: {ip} 通 ({format_ms(response_time)})")
 
-    # 在Windows上降低并发数以避免句柄问题
-    max_workers = 50 if platform.system() == "Windows" else 100
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        executor.map(worker, ips)
+    async def run():
+        # 回退到系统ping命令时与TCP扫描一样由固定数量的工作协程并发，
+        # 同时运行的ping进程数即协程数，不超过IP数
+        targets = format_ips(ips, version)
+        workers = min(PING_CONCURRENCY, len(ips))
+        await asyncio.gather(*(worker(targets) for _ in range(workers)))
 
+    asyncio.run(run())
 
-def scan_tcp(ips, ports):
+
+def scan_tcp(ips, ports, version=4):
     """使用TCP协议扫描IP地址和端口组合"""
     print("TCP端口扫描中...")
     print("-" * 40)
 
-    def worker(args):
-        ip, port = args
-        is_open, response_time = tcp_connect(ip, port)
-        if is_open:
-            print(f"IP: {ip}:{port} 开放 ({response_time:.2f} ms)")
+    async def worker(targets):
+        # 多个工作协程共用同一个迭代器，取下一个目标时不会切换协程，不会重复或遗漏
+        for ip, port in targets:
+            is_open, response_time = await tcp_connect(ip, port)
+            if is_open:
+                # IPv6地址本身带冒号，按惯例写成 [地址]:端口
+                host = f"[{ip}]" if version == 6 else ip
+                print(f"IP: {host}:{port} 开放 ({format_ms(response_time)})")
+
+    async def run():
+        # 单线程事件循环驱动固定数量的工作协程，同时进行的连接数即协程数；
+        # 目标按需生成，不会为 IP数×端口数 个组合一次性创建协程
+        targets = ((ip, port) for ip in format_ips(ips, version) for port in ports)
+        workers = tcp_concurrency(len(ips) * len(ports))
+        await asyncio.gather(*(worker(targets) for _ in range(workers)))
 
-    # 创建所有IP和端口的组合
-    tasks = [(ip, port) for ip in ips for port in ports]
-    # 在Windows上降低并发数以避免句柄问题
-    max_workers = 50 if platform.system() == "Windows" else 100
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        executor.map(worker, tasks)
+    asyncio.run(run())
 
 
 def main():
     """主函数"""
     if len(sys.argv) < 2:
-        print("使用方法:")
-        print("  ICMP测试: python saoip.py <IP或IP段>")
-        print("  TCP测试:  python saoip.py <IP或IP段> <端口列表>")
-        print("\n示例:")
-        print("  python saoip.py 192.168.1.1")
-        print("  python saoip.py 192.168.1.1/24 80,443,81-8080")
+        # 拼成一段一次性输出，避免逐行写控制台
+        usage = [
+            "使用方法:",
+            "  ICMP测试: python saoip.py <IP或IP段>",
+            "  TCP测试:  python saoip.py <IP或IP段> <端口列表>",
+            "\n示例:",
+            "  python saoip.py 192.168.1.1",
+            "  python saoip.py 192.168.1.1/24 80,443,81-8080",
+            "  python saoip.py fd00::1/120 22,80",
+        ]
+        print("\n".join(usage))
         return
 
     # 解析IP地址
-    ips = parse_ip_range(sys.argv[1])
+    version, ips = parse_ip_range(sys.argv[1])
     if not ips:
         return
 
     # 选择扫描模式
     if len(sys.argv) == 2:
-        scan_icmp(ips)
+        scan_icmp(ips, version)
     else:
         try:
             ports = parse_ports(sys.argv[2])
-            scan_tcp(ips, ports)
+            scan_tcp(ips, ports, version)
         except ValueError:
             print(f"错误: 端口格式不正确 '{sys.argv[2]}'")
 
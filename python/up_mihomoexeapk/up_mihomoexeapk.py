@@ -3,11 +3,92 @@
 自动下载最新版本并保存到下载文件夹
 """
 
+import json
+import os
+import threading
 import zipfile
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 import shutil
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# 从压缩包复制文件时使用的缓冲区大小
+COPY_BUFFER_SIZE = 1 << 20
+# 下载时每次读取的数据量，块越大Python层的循环和写入次数越少
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+# 下载的压缩包不超过该大小时只保存在内存中
+ZIP_SPOOL_SIZE = 64 << 20
+
+# 复用同一个会话，查询版本和下载文件共享连接池，省去重复的TCP/TLS握手；
+# 两个更新在不同线程中同时进行，每个主机保留多个连接
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# 记录每个发布信息URL上次的ETag和版本号，版本未变时GitHub返回304，不必重新下载
+ETAG_CACHE_FILE = Path.home() / ".cache" / "up_mihomoexeapk.json"
+_etag_cache_lock = threading.Lock()
+
+# 两个更新在不同线程中输出进度，print会分两次写入内容和换行，需要加锁防止交错
+_print_lock = threading.Lock()
+
+
+def log(message):
+    """线程安全地输出一行消息"""
+    with _print_lock:
+        print(message)
+
+
+def read_etag_cache():
+    """读取ETag缓存，文件不存在或已损坏时返回空字典"""
+    try:
+        with open(ETAG_CACHE_FILE, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def remember_etag(repo_url, etag, version):
+    """
+    保存发布信息的ETag和版本号
+
+    两个更新在不同线程中进行，读取-修改-写入需要加锁，
+    并先写入临时文件再替换，避免中途出错留下不完整的缓存；
+    缓存只用于跳过重复下载，写入失败不影响本次更新结果
+    """
+    with _etag_cache_lock:
+        cache = read_etag_cache()
+        cache[repo_url] = {"etag": etag, "version": version}
+        temp_path = ETAG_CACHE_FILE.with_name(ETAG_CACHE_FILE.name + ".tmp")
+        try:
+            ETAG_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, ETAG_CACHE_FILE)
+        except OSError:
+            pass
+
+
+def find_zip_member(zip_ref, suffix):
+    """
+    查找压缩包根目录下指定扩展名的文件
+
+    Args:
+        zip_ref: 已打开的ZipFile
+        suffix: 扩展名，如 ".exe"
+
+    Returns:
+        匹配的ZipInfo，找不到时返回None
+    """
+    for info in zip_ref.infolist():
+        if info.is_dir() or "/" in info.filename:
+            continue
+        if Path(info.filename).suffix == suffix:
+            return info
+    return None
 
 
 def download_and_extract(repo_url, asset_filter, output_name, file_type):
@@ -21,16 +102,27 @@ def download_and_extract(repo_url, asset_filter, output_name, file_type):
         file_type: 文件类型描述
     """
     download_dir = Path.home() / "Downloads"
+    final_path = download_dir / output_name
+    # 下载或解压的中间结果先写到这里，完成后再替换最终文件
+    temp_path = final_path.with_name(final_path.name + ".tmp")
 
     try:
-        # 获取发布信息
-        print(f"🔍 正在检查 {file_type} 最新版本...")
-        response = requests.get(repo_url)
+        # 获取发布信息；本地文件还在时带上次的ETag，版本未变只会收到304
+        log(f"🔍 正在检查 {file_type} 最新版本...")
+        cached = read_etag_cache().get(repo_url)
+        headers = {}
+        if cached and cached.get("etag") and final_path.exists():
+            headers["If-None-Match"] = cached["etag"]
+        response = SESSION.get(repo_url, headers=headers)
+        if response.status_code == 304:
+            log(f"✅ {file_type} 已是最新版本: {cached.get('version')}\n")
+            return True
         response.raise_for_status()
         release = response.json()
+        etag = response.headers.get("ETag")
 
         version = release["tag_name"]
-        print(f"🎯 最新版本: {version}")
+        log(f"🎯 {file_type} 最新版本: {version}")
 
         # 查找匹配的资源
         asset = None
@@ -40,64 +132,55 @@ def download_and_extract(repo_url, asset_filter, output_name, file_type):
                 break
 
         if not asset:
-            print(f"❌ 未找到 {file_type} 版本")
+            log(f"❌ 未找到 {file_type} 版本")
             return False
 
-        print(f"📦 找到资源: {asset['name']}")
-
-        # 下载文件
-        download_path = download_dir / asset["name"]
-        print(f"⬇️  正在下载...")
-
-        with requests.get(asset["browser_download_url"], stream=True) as response:
-            response.raise_for_status()
-            with open(download_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-
-        final_path = download_dir / output_name
-
-        # 处理文件
-        if asset["name"].endswith(".zip"):
-            # 解压压缩包
-            temp_dir = download_dir / f"temp_{file_type.lower()}"
-            temp_dir.mkdir(exist_ok=True)
-
-            with zipfile.ZipFile(download_path, "r") as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            # 查找目标文件
-            target_file = None
-            for file in temp_dir.iterdir():
-                if file_type == "Mihomo" and file.suffix == ".exe":
-                    target_file = file
-                    break
-                elif file_type == "ClashMetaForAndroid" and file.suffix == ".apk":
-                    target_file = file
-                    break
-
-            if not target_file:
-                print(f"❌ 在压缩包中未找到目标文件")
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                download_path.unlink(missing_ok=True)
-                return False
-
-            # 移动最终文件
-            shutil.move(str(target_file), str(final_path))
-
-            # 清理临时文件
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            download_path.unlink(missing_ok=True)
-        else:
-            # 直接重命名文件
-            download_path.rename(final_path)
+        log(f"📦 {file_type} 找到资源: {asset['name']}")
+
+        is_zip = asset["name"].endswith(".zip")
+        log(f"⬇️  正在下载 {asset['name']}...")
 
-        print(f"✅ {file_type} 更新完成！文件位置: {final_path}")
-        print(f"📋 版本号: {version}\n")
+        # 不是压缩包时直接下载到最终位置旁的临时文件；压缩包只是中间产物，
+        # 下载到内存中（超过上限时自动转存到系统临时文件），不写入下载文件夹
+        if is_zip:
+            download_file = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE)
+        else:
+            download_file = open(temp_path, "wb")
+
+        with download_file:
+            with SESSION.get(asset["browser_download_url"], stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    download_file.write(chunk)
+
+            if is_zip:
+                # 只解压需要的那个文件，不解压说明文档等其他内容
+                suffix = ".exe" if file_type == "Mihomo" else ".apk"
+                download_file.seek(0)
+                with zipfile.ZipFile(download_file, "r") as zip_ref:
+                    member = find_zip_member(zip_ref, suffix)
+                    if member is None:
+                        log(f"❌ 在 {asset['name']} 中未找到目标文件")
+                        return False
+
+                    # 先写入临时文件再替换，解压中途出错不会破坏旧版本
+                    with zip_ref.open(member) as src, open(temp_path, "wb") as dst:
+                        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+        # 同一目录内替换，旧文件存在时也能覆盖（Path.rename在Windows上会失败）
+        temp_path.replace(final_path)
+
+        if etag:
+            remember_etag(repo_url, etag, version)
+
+        # 完成信息合并成一条输出，不会被另一个线程的输出隔开
+        log(f"✅ {file_type} 更新完成！文件位置: {final_path}\n📋 版本号: {version}\n")
         return True
 
     except Exception as e:
-        print(f"❌ {file_type} 更新出错: {e}\n")
+        # 下载或解压中途失败时删除不完整的临时文件
+        temp_path.unlink(missing_ok=True)
+        log(f"❌ {file_type} 更新出错: {e}\n")
         return False
 
 
@@ -138,11 +221,12 @@ def main():
     print("🚀 一键更新脚本 - Mihomo & ClashMetaForAndroid")
     print("=" * 50)
 
-    # 更新 Mihomo
-    mihomo_success = update_mihomo()
-
-    # 更新 ClashMetaForAndroid
-    clash_success = update_clash_android()
+    # 两个更新互不依赖，且主要时间花在网络下载上，用两个线程同时进行
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        mihomo_future = executor.submit(update_mihomo)
+        clash_future = executor.submit(update_clash_android)
+    mihomo_success = mihomo_future.result()
+    clash_success = clash_future.result()
 
     # 显示结果摘要
     print("=" * 50)
@@ -0,0 +1,117 @@
+"""
+processing_cosplay_files1 的7z批量解压测试
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from processing_cosplay_files import processing_cosplay_files1 as cosplay1
+
+# 记录每次调用参数的假7z：-ai@列表文件 在7z返回后就会被删除，需要当场读出内容
+FAKE_7Z = """#!{python}
+import json
+import sys
+
+args = sys.argv[1:]
+listed = []
+for arg in args:
+    if arg.startswith("-ai@"):
+        with open(arg[4:], encoding="utf-8") as f:
+            listed = f.read().splitlines()
+with open({calls_path!r}, "a", encoding="utf-8") as f:
+    f.write(json.dumps({{"args": args, "listed": listed}}) + "\\n")
+"""
+
+
+@pytest.fixture
+def fake_7z(tmp_path, monkeypatch):
+    """把SEVEN_ZIP_PATH换成假7z，返回读取调用记录的函数"""
+    calls_path = tmp_path / "calls.jsonl"
+    script = tmp_path / "7z"
+    script.write_text(
+        FAKE_7Z.format(python=sys.executable, calls_path=str(calls_path)),
+        encoding="utf-8",
+    )
+    script.chmod(0o755)
+    monkeypatch.setattr(cosplay1, "SEVEN_ZIP_PATH", str(script))
+
+    def read_calls():
+        if not calls_path.exists():
+            return []
+        with open(calls_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    return read_calls
+
+
+@pytest.mark.skipif(os.name == "nt", reason="假7z依赖shebang")
+def test_batch_runs_one_7z_call(tmp_path, fake_7z):
+    archive_dir = tmp_path / "archives"
+    archive_dir.mkdir()
+    file_paths = []
+    for name in ("第一卷.rar", "b.7z"):
+        path = archive_dir / name
+        path.write_bytes(b"")
+        file_paths.append(str(path))
+
+    assert cosplay1.extract_7z_batch(file_paths, str(archive_dir)) == 2
+
+    calls = fake_7z()
+    assert len(calls) == 1
+    args = calls[0]["args"]
+    # 压缩包名只能来自列表文件，不能把 @列表文件 当成压缩包名
+    assert args[:2] == ["x", "-an"]
+    assert args[2].startswith("-ai@")
+    assert "-scsUTF-8" in args
+    assert calls[0]["listed"] == file_paths
+    # 列表文件已删除，压缩包解压成功后也已删除
+    assert not os.path.exists(args[2][4:])
+    assert not any(os.path.exists(path) for path in file_paths)
+
+
+SEVEN_ZIP = shutil.which("7z") or shutil.which("7zz") or shutil.which("7za")
+
+
+@pytest.mark.skipif(SEVEN_ZIP is None, reason="需要安装7-Zip")
+def test_batch_with_real_7z(tmp_path, monkeypatch):
+    monkeypatch.setattr(cosplay1, "SEVEN_ZIP_PATH", SEVEN_ZIP)
+    source_dir = tmp_path / "source"
+    archive_dir = tmp_path / "archives"
+    source_dir.mkdir()
+    archive_dir.mkdir()
+
+    file_paths = []
+    for name in ("第一卷", "second"):
+        (source_dir / f"{name}.txt").write_text(name, encoding="utf-8")
+        archive = archive_dir / f"{name}.7z"
+        subprocess.run(
+            [SEVEN_ZIP, "a", "-bso0", "-bsp0", str(archive), f"{name}.txt"],
+            cwd=source_dir,
+            check=True,
+        )
+        file_paths.append(str(archive))
+
+    assert cosplay1.extract_7z_batch(file_paths, str(archive_dir)) == 2
+    for name in ("第一卷", "second"):
+        extracted = archive_dir / f"{name}.txt"
+        assert extracted.read_text(encoding="utf-8") == name
+
+
+@pytest.mark.skipif(os.name == "nt", reason="创建符号链接需要额外权限")
+def test_iter_matching_skips_directory_symlinks(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "inner.gif").write_bytes(b"")
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "a.GIF").write_bytes(b"")
+    (work / "linked.gif").symlink_to(outside, target_is_directory=True)
+
+    found = [entry.name for entry in cosplay1.iter_matching(str(work), (".gif",))]
+
+    assert found == ["a.GIF"]
@@ -0,0 +1,27 @@
+"""
+processing_cosplay_files2 的文件遍历测试
+"""
+
+import os
+
+import pytest
+
+from processing_cosplay_files import processing_cosplay_files2 as cosplay2
+
+
+@pytest.mark.skipif(os.name == "nt", reason="创建符号链接需要额外权限")
+def test_directory_symlink_is_not_deleted(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.txt").write_text("x", encoding="utf-8")
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "a.webp").write_bytes(b"")
+    (work / "b.txt").write_bytes(b"")
+    (work / "linked").symlink_to(outside, target_is_directory=True)
+
+    cosplay2.delete_non_webp_files(str(work))
+
+    assert sorted(os.listdir(work)) == ["a.webp", "linked"]
+    # 不进入符号链接，链接目标里的文件不受影响
+    assert (outside / "keep.txt").exists()